@@ -2,7 +2,6 @@
 
 import argparse
 import sys
-import os
 import platform
 import locale
 from pathlib import Path
@@ -10,6 +9,11 @@ from pathlib import Path
 from update_notes.processor import process_markdown_files
 
 
+# platform.system() does not change while the program runs
+_PLATFORM = platform.system()
+_IS_WINDOWS = _PLATFORM == "Windows"
+
+
 def main():
     """Execute the main program."""
     parser = argparse.ArgumentParser(description="Process Obsidian Markdown files")
@@ -33,16 +37,14 @@ def main():
     args = parser.parse_args()
     
     # Handle Windows-specific configurations if needed
-    if args.windows_console or platform.system() == "Windows":
-        # Fix console encoding issues on Windows
-        if platform.system() == "Windows":
-            # Ensure console can display Japanese characters
-            if sys.stdout.encoding.lower() != 'utf-8':
-                # Try to set console to use utf-8
-                os.system("chcp 65001 > nul")
-                # For older Python versions (< 3.7) this might be needed
-                sys.stdout.reconfigure(encoding='utf-8') if hasattr(sys.stdout, 'reconfigure') else None
-                sys.stderr.reconfigure(encoding='utf-8') if hasattr(sys.stderr, 'reconfigure') else None
+    # (the encoding fix only applies on Windows, with or without --windows-console)
+    # Ensure console can display Japanese characters
+    if _IS_WINDOWS and not sys.stdout.encoding.lower().startswith('utf'):
+        # Switch the streams to utf-8 (reconfigure is missing before 3.7).
+        # This is enough for this process, so no "chcp 65001" shell
+        # has to be spawned on every start-up
+        sys.stdout.reconfigure(encoding='utf-8') if hasattr(sys.stdout, 'reconfigure') else None
+        sys.stderr.reconfigure(encoding='utf-8') if hasattr(sys.stderr, 'reconfigure') else None
     
     # Convert to Path objects
     vault_path = Path(args.vault_dir)
@@ -65,7 +67,7 @@ def main():
     output_path.mkdir(exist_ok=True, parents=True)
     
     # Print information
-    print(f"Platform: {platform.system()}")
+    print(f"Platform: {_PLATFORM}")
     print(f"Python encoding: {sys.getdefaultencoding()}")
     print(f"Console encoding: {sys.stdout.encoding}")
     
@@ -1,11 +1,53 @@
 """Process Obsidian Markdown files."""
 
+import errno
+import itertools
 import re
 import os
-import shutil
-from datetime import datetime
+import sys
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import date
 from pathlib import Path
-from typing import List, Optional, Dict, Tuple, Set
+from typing import BinaryIO, DefaultDict, List, Optional, Dict, Tuple, Set, Iterable
+
+
+# Minimum number of daily notes for which worker processes are started.
+# Starting a worker takes about 5 ms with fork and 50 ms or more with spawn
+# (Windows, macOS), and every parsed note is pickled back and unpickled here
+# one at a time, at about half the cost of parsing it. The pool only pays off
+# for large backlogs, such as the first run over a vault with years of notes
+_MIN_FILES_FOR_WORKERS = 2000
+
+# ProcessPoolExecutor rejects more than 61 workers on Windows
+_MAX_WORKERS = 61
+
+# Buffer size used when writing output files
+_WRITE_BUFFER_SIZE = 1 << 16
+
+
+# Default heading for content before the first heading
+_DEFAULT_HEADING = "# はじめに"
+
+# Image references: group "md" is the target of a Markdown image ![alt](path)
+# and group "wiki" the target of an Obsidian wiki image ![[path]]. The alt
+# text may continue over line breaks, as in the original two patterns.
+_IMAGE_RE = re.compile(
+    r'!\[[^\]]*\]\((?P<md>[^)\n]+)\)'
+    r'|!\[\[(?P<wiki>[^\]\n]+)\]\]'
+)
+
+# Markdown heading lines, used to split notes into sections
+_HEADING_RE = re.compile(r'^#{1,6}[^\S\n]+.+$', re.MULTILINE)
+
+# URL prefixes of images that are not files in the vault
+_EXTERNAL_IMAGE_PREFIXES = ('http://', 'https://', 'ftp://', 'file://', 'data:', 'mailto:')
+
+# Daily note file names (yyyy-mm-dd.md)
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}\.md$')
+
+# Translation table replacing characters that aren't safe for filenames
+_FILENAME_TRANS = str.maketrans({c: '_' for c in '\\/*?:"<>|'})
 
 
 def process_markdown_files(input_directory: Path, output_directory: Path) -> None:
@@ -23,38 +65,39 @@ def process_markdown_files(input_directory: Path, output_directory: Path) -> Non
     oldfiles_dir.mkdir(exist_ok=True)
     print(f"Processed files will be moved to {oldfiles_dir}")
     
-    # Find all markdown files with yyyy-mm-dd.md pattern
-    date_pattern = re.compile(r'^(\d{4})-(\d{2})-(\d{2})\.md$')
-    daily_notes = []
-    
-    for file_path in input_directory.glob("*.md"):
-        match = date_pattern.match(file_path.name)
-        if match:
-            # Parse date from filename
-            year, month, day = match.groups()
+    # Get today's date; today's note is matched by its file name alone
+    today_date_str = date.today().isoformat()
+    today_filename = f"{today_date_str}.md"
+    skipped_count = 0
+
+    # Find all markdown files with yyyy-mm-dd.md pattern, except today's
+    daily_notes_to_process = []
+
+    # Scan the directory entries directly so that a Path object is only
+    # built for the files whose name actually looks like a daily note
+    with os.scandir(input_directory) as entries:
+        for entry in entries:
+            # Skip today's file before matching or parsing its name
+            if entry.name == today_filename:
+                if entry.is_file():
+                    skipped_count += 1
+                continue
+            # Match the name first: is_file() is answered from the directory
+            # entry for regular files, but may need a stat for other entries
+            if not _DATE_RE.match(entry.name) or not entry.is_file():
+                continue
+            # Parse date from filename (the regex guarantees the yyyy-mm-dd
+            # form, which date.fromisoformat parses on a C fast path)
+            date_str = entry.name[:10]
             try:
-                file_date = datetime(int(year), int(month), int(day))
-                date_str = f"{year}-{month}-{day}"
-                daily_notes.append((file_path, file_date, date_str))
+                file_date = date.fromisoformat(date_str)
             except ValueError:
                 # Skip files with invalid dates
-                print(f"Skipping file with invalid date: {file_path.name}")
-    
-    # Get today's date
-    today_date = datetime.now().date()
-    today_date_str = today_date.strftime('%Y-%m-%d')
+                print(f"Skipping file with invalid date: {entry.name}")
+                continue
+            daily_notes_to_process.append((Path(entry.path), file_date, date_str))
 
-    # Filter out today's file
-    original_count = len(daily_notes)
-    print(f"DEBUG: Today's date is {today_date}") # DEBUG PRINT
-    print("DEBUG: Checking daily notes:") # DEBUG PRINT
-    daily_notes_to_process = []
-    for note in daily_notes:
-        file_date_only = note[1].date()
-        print(f"DEBUG: Comparing {file_date_only} with {today_date}. Equal? {file_date_only == today_date}") # DEBUG PRINT
-        if file_date_only != today_date:
-            daily_notes_to_process.append(note)
-    skipped_count = original_count - len(daily_notes_to_process)
+    original_count = len(daily_notes_to_process) + skipped_count
 
     if skipped_count > 0:
         print(f"Skipping {skipped_count} file(s) from today ({today_date_str})")
@@ -64,42 +107,68 @@ def process_markdown_files(input_directory: Path, output_directory: Path) -> Non
 
     print(f"Found {original_count} daily note files, processing {len(daily_notes_to_process)}")
 
-    # Dictionary to accumulate content by heading
-    heading_contents: Dict[str, List[str]] = {}
+    # Dictionary to accumulate content by heading, one chunk per file
+    heading_contents: DefaultDict[str, List[List[str]]] = defaultdict(list)
     
     # Set to track all referenced image files
     all_image_refs: Set[str] = set()
     
-    # Process each file in chronological order (use the filtered list)
-    for file_path, file_date, date_str in daily_notes_to_process:
-        file_sections, image_refs = process_file(file_path, date_str)
-
-        # Accumulate sections by heading
-        for heading, content in file_sections.items():
-            if heading not in heading_contents:
-                heading_contents[heading] = []
-            
-            # Only add content if it's not empty
-            if content and not all(line.strip() == "" for line in content):
-                heading_contents[heading].extend(content)
+    file_paths = [file_path for file_path, _, _ in daily_notes_to_process]
+    date_strs = [date_str for _, _, date_str in daily_notes_to_process]
+    
+    # Parsing is CPU bound, so very large batches are read and parsed in
+    # worker processes. For anything smaller, and on single CPU machines,
+    # starting the workers and returning their results costs more than the
+    # parsing itself, so the notes are parsed in this process. The results are
+    # consumed in chronological order here, so accumulating the sections and
+    # moving the files stays sequential
+    with ExitStack() as stack:
+        # Per-file progress messages are collected and written with a single
+        # call once the loop is done (or has failed)
+        messages: List[str] = []
+        stack.callback(_write_messages, messages)
         
-        # Add image references
-        all_image_refs.update(image_refs)
+        max_workers = min(os.cpu_count() or 1, len(daily_notes_to_process), _MAX_WORKERS)
+        if len(daily_notes_to_process) >= _MIN_FILES_FOR_WORKERS and max_workers > 1:
+            # Imported here: concurrent.futures.process pulls in multiprocessing
+            # and logging, which small batches and --help never need
+            from concurrent.futures import ProcessPoolExecutor
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=max_workers))
+            results = executor.map(process_file, file_paths, date_strs,
+                                   chunksize=max(1, len(file_paths) // (max_workers * 4)))
+        else:
+            results = map(process_file, file_paths, date_strs)
         
-        # Move the processed file to oldfiles directory
-        destination = oldfiles_dir / file_path.name
-        try:
-            # Windows workaround: First try to rename, if that fails try copy and delete
+        # Process each file in chronological order (use the filtered list)
+        for (file_path, file_date, date_str), (file_sections, image_refs) in zip(daily_notes_to_process, results):
+            messages.append(f"Processing {file_path.name}")
+            
+            # Accumulate sections by heading
+            for heading, content in file_sections.items():
+                # process_file only returns sections with non-empty content
+                heading_contents[heading].append(content)
+            
+            # Add image references
+            all_image_refs.update(image_refs)
+            
+            # Move the processed file to oldfiles directory
+            destination = oldfiles_dir / file_path.name
             try:
-                file_path.rename(destination)
-            except OSError:
-                # If rename fails (common on Windows), try copy and delete
-                shutil.copy2(file_path, destination)
-                os.unlink(file_path)
-            print(f"Moved {file_path.name} to oldfiles directory")
-        except Exception as e:
-            print(f"Error moving {file_path.name}: {e}")
-            print("The file will be kept in its original location")
+                # os.replace overwrites an existing destination on every platform,
+                # so the copy-and-delete fallback for Windows is not needed
+                try:
+                    os.replace(file_path, destination)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # oldfiles is on another filesystem (a mount point or a
+                    # link to another drive), where only copying works
+                    import shutil
+                    shutil.move(os.fspath(file_path), os.fspath(destination))
+                messages.append(f"Moved {file_path.name} to oldfiles directory")
+            except OSError as e:
+                messages.append(f"Error moving {file_path.name}: {e}")
+                messages.append("The file will be kept in its original location")
     
     # Copy referenced image files to output directory
     copy_image_files(input_directory, output_directory, all_image_refs)
@@ -108,6 +177,16 @@ def process_markdown_files(input_directory: Path, output_directory: Path) -> Non
     write_output_files(heading_contents, output_directory)
 
 
+def _write_messages(messages: List[str]) -> None:
+    """Write progress messages to stdout with a single call.
+    
+    Args:
+        messages: Messages to write, one per line
+    """
+    if messages:
+        sys.stdout.write('\n'.join(messages) + '\n')
+
+
 def process_file(file_path: Path, date_str: str) -> Tuple[Dict[str, List[str]], Set[str]]:
     """Process a single markdown file.
     
@@ -116,46 +195,110 @@ def process_file(file_path: Path, date_str: str) -> Tuple[Dict[str, List[str]],
         date_str: Date string in yyyy-mm-dd format from the filename
     
     Returns:
-        Tuple of (Dictionary mapping headings to their content, Set of image references)
+        Tuple of (Dictionary mapping headings to their non-empty content, Set of image references)
     """
-    print(f"Processing {file_path.name}")
-    
-    # Parse the file content
-    with open(file_path, 'r', encoding='utf-8') as infile:
-        content = infile.read()
+    # Parse the file content with one read and one decode, bypassing the
+    # text I/O layer. The bytes are released right after decoding, so only
+    # one copy of the text is alive while it is scanned
+    content = file_path.read_bytes().decode('utf-8')
+    # Normalize line endings the same way text mode reading does, without
+    # another full copy of the text when there are only CRLF line endings
+    if '\r' in content:
+        content = content.replace('\r\n', '\n')
+        if '\r' in content:
+            content = content.replace('\r', '\n')
     
     # Split content by headings
-    # Regex matches any markdown heading (# followed by space and text)
-    heading_pattern = re.compile(r'^(#{1,6}\s+.+)$', re.MULTILINE)
-    
-    # Split the content by headings
-    sections: Dict[str, List[str]] = {}
-    current_heading = "# はじめに"  # Default heading for content before first heading
-    sections[current_heading] = []
-    
-    # Process the file line by line
-    for line in content.split('\n'):
-        # Check if line is a heading
-        if heading_pattern.match(line):
-            current_heading = line
-            # Initialize the list for this heading if it doesn't exist
-            if current_heading not in sections:
-                sections[current_heading] = []
-        else:
-            # Add the line to the current heading's content
-            sections[current_heading].append(line)
+    # Every section starts with the date header, so the lines are collected
+    # right after it instead of being copied into a new list afterwards
+    section_header = [f"## {date_str}", ""]
+    sections, nonempty_headings = _scan_sections(content, section_header)
     
-    # Add the date header to the beginning of each section's content
-    date_header = f"## {date_str}"
+    # Only keep sections with non-empty content
+    nonempty_sections: Dict[str, List[str]] = {}
     for heading, lines in sections.items():
-        # Only add the date header if there's non-empty content
-        if lines and not all(line.strip() == "" for line in lines):
-            sections[heading] = [date_header, ""] + lines + [""]
+        if heading in nonempty_headings:
+            lines.append("")
+            nonempty_sections[heading] = lines
     
-    # Find all referenced image files
+    # Find all referenced image files in a separate pass, so that an image
+    # whose alt text spans lines never interferes with the headings
     image_references = find_image_references(content)
     
-    return sections, image_references
+    return nonempty_sections, image_references
+
+
+def _scan_sections(content: str, section_header: List[str]) -> Tuple[Dict[str, List[str]], Set[str]]:
+    """Split Markdown content by headings.
+    
+    Args:
+        content: Markdown content
+        section_header: Lines each section's list starts with
+    
+    Returns:
+        Tuple of (Dictionary mapping headings to the header and their raw lines,
+        Set of headings with non-whitespace content)
+    """
+    current_heading = _DEFAULT_HEADING
+    sections: Dict[str, List[str]] = {current_heading: section_header.copy()}
+    nonempty_headings: Set[str] = set()
+    
+    # Offset of the first line that has not been assigned to a section yet
+    body_start = 0
+    
+    for match in _HEADING_RE.finditer(content):
+        # A heading always starts a line, so the pending body is either empty
+        # or ends with the newline right before the heading
+        if match.start() > body_start:
+            body = content[body_start:match.start() - 1]
+            sections[current_heading].extend(body.split('\n'))
+            # Track non-empty sections on the body text itself, instead of
+            # rescanning their lines afterwards
+            if body and not body.isspace():
+                nonempty_headings.add(current_heading)
+        
+        # The same headings recur across many notes; interning makes them
+        # share one string object and turns key comparisons into identity checks
+        current_heading = sys.intern(match.group())
+        # Register the section when its heading is first seen, so that the
+        # sections keep the order in which the headings first appear
+        if current_heading not in sections:
+            sections[current_heading] = section_header.copy()
+        
+        # Skip the newline that terminates the heading line
+        body_start = match.end() + 1
+    
+    # Remaining lines after the last heading
+    if body_start <= len(content):
+        body = content[body_start:]
+        sections[current_heading].extend(body.split('\n'))
+        if body and not body.isspace():
+            nonempty_headings.add(current_heading)
+    
+    return sections, nonempty_headings
+
+
+def _image_reference(md_image_path: Optional[str], wiki_image_path: Optional[str]) -> Optional[str]:
+    """Turn a matched image target into the referenced image file path.
+    
+    Args:
+        md_image_path: Target of a Markdown style image, if that syntax matched
+        wiki_image_path: Target of an Obsidian wiki style image, if that syntax matched
+    
+    Returns:
+        Image file path, or None for an external image
+    """
+    if md_image_path is None:
+        # In Obsidian, image references might not include the file extension
+        return wiki_image_path
+    
+    # Remove any URL fragments or query parameters
+    image_path = md_image_path.partition('#')[0].partition('?')[0]
+    # Skip external images: the common prefixes are checked first, then any
+    # other URL scheme (e.g. "HTTPS://", "obsidian://") like the original check
+    if image_path.startswith(_EXTERNAL_IMAGE_PREFIXES) or '://' in image_path:
+        return None
+    return image_path
 
 
 def find_image_references(content: str) -> Set[str]:
@@ -167,29 +310,13 @@ def find_image_references(content: str) -> Set[str]:
     Returns:
         Set of image file paths
     """
-    # Regex patterns for both Markdown image syntax ![alt](path) and wiki syntax ![[path]]
-    md_image_pattern = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
-    wiki_image_pattern = re.compile(r'!\[\[([^\]]+)\]\]')
-    
-    image_paths = set()
-    
-    # Find Markdown style images
-    for match in md_image_pattern.finditer(content):
-        image_path = match.group(2)
-        # Remove any URL fragments or query parameters
-        image_path = image_path.split('#')[0].split('?')[0]
-        # Remove any URL scheme
-        if '://' in image_path:
-            continue  # Skip external images
-        image_paths.add(image_path)
-    
-    # Find Obsidian wiki style images
-    for match in wiki_image_pattern.finditer(content):
-        image_path = match.group(1)
-        # In Obsidian, image references might not include the file extension
-        image_paths.add(image_path)
-    
-    return image_paths
+    # Both image syntaxes are found in a single scan of the content, and the
+    # set is built in one comprehension without an intermediate list
+    return {
+        image_path
+        for match in _IMAGE_RE.finditer(content)
+        if (image_path := _image_reference(match.group('md'), match.group('wiki'))) is not None
+    }
 
 
 def copy_image_files(input_directory: Path, output_directory: Path, image_refs: Set[str]) -> None:
@@ -203,48 +330,73 @@ def copy_image_files(input_directory: Path, output_directory: Path, image_refs:
     if not image_refs:
         return
     
+    # Only needed once there is something to copy
+    import shutil
+    
     print(f"Copying referenced image files...")
     
     # Common image extensions
     image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.svg', '.webp']
     
+    # Work with plain string paths in the loop below, avoiding a Path
+    # object for every reference
+    input_dir = os.fspath(input_directory)
+    output_dir = os.fspath(output_directory)
+    
+    # Index the input directory once instead of probing every candidate
+    # filename with its own stat call
+    with os.scandir(input_dir) as entries:
+        file_names = {entry.name for entry in entries if entry.is_file()}
+    
+    # Map names without extension to the image file they resolve to, keeping
+    # the first match in the order of image_extensions
+    image_candidates = []
+    for name in file_names:
+        stem, ext = os.path.splitext(name)
+        if ext in image_extensions:
+            image_candidates.append((image_extensions.index(ext), stem, name))
+    image_stems: Dict[str, str] = {}
+    for _, stem, name in sorted(image_candidates):
+        image_stems.setdefault(stem, name)
+    
     # Track images that were copied
     copied_images = []
     
+    # Images are copied flat into the output directory, so it is the only
+    # parent that ever needs to exist
+    os.makedirs(output_dir, exist_ok=True)
+    
     for ref in image_refs:
-        # Check if the reference is a direct path
-        ref_path = Path(ref)
+        if os.path.dirname(ref):
+            # References into subdirectories are not covered by the index
+            source_name = None
+        elif ref in file_names:
+            # The reference is a direct path
+            source_name = ref
+        elif not os.path.splitext(ref)[1]:
+            # If the reference doesn't have a file extension (common in Obsidian),
+            # look it up among the images with common extensions
+            source_name = image_stems.get(ref)
+        else:
+            source_name = None
         
-        # Check if the referenced file exists in the input directory
-        source_path = input_directory / ref_path
-        if source_path.exists() and source_path.is_file():
-            # Copy the image file to the output directory
-            dest_path = output_directory / ref_path.name
-            try:
-                # Create parent directories if needed
-                dest_path.parent.mkdir(exist_ok=True, parents=True)
-                shutil.copy2(source_path, dest_path)
-                copied_images.append(ref_path.name)
-            except Exception as e:
-                print(f"Error copying image {ref_path.name}: {e}")
-            continue
-
-        # If the reference doesn't have a file extension (common in Obsidian),
-        # try adding common image extensions
-        if not ref_path.suffix:
-            for ext in image_extensions:
-                source_path = input_directory / f"{ref}{ext}"
-                if source_path.exists() and source_path.is_file():
-                    # Copy the image file to the output directory
-                    dest_path = output_directory / f"{ref_path.name}{ext}"
-                    try:
-                        # Create parent directories if needed
-                        dest_path.parent.mkdir(exist_ok=True, parents=True)
-                        shutil.copy2(source_path, dest_path)
-                        copied_images.append(f"{ref_path.name}{ext}")
-                    except Exception as e:
-                        print(f"Error copying image {ref_path.name}{ext}: {e}")
-                    break
+        if source_name is None:
+            # The index only matches names exactly, so a miss is not final:
+            # probe the filesystem, which applies its own case and Unicode
+            # normalization rules (e.g. "photo.png" finds "Photo.png" on Windows)
+            source_name = _find_image_file(input_dir, ref, image_extensions)
+            if source_name is None:
+                continue
+        
+        # Copy the image file to the output directory
+        dest_name = os.path.basename(source_name)
+        try:
+            # Metadata is not needed for derived copies, and copyfile
+            # uses the platform's fast copy path (sendfile, CopyFile)
+            shutil.copyfile(os.path.join(input_dir, source_name), os.path.join(output_dir, dest_name))
+            copied_images.append(dest_name)
+        except Exception as e:
+            print(f"Error copying image {dest_name}: {e}")
     
     if copied_images:
         print(f"Copied {len(copied_images)} image files: {', '.join(copied_images[:5])}{'...' if len(copied_images) > 5 else ''}")
@@ -252,52 +404,156 @@ def copy_image_files(input_directory: Path, output_directory: Path, image_refs:
         print("No image files found to copy")
 
 
-def write_output_files(heading_contents: Dict[str, List[str]], output_directory: Path) -> None:
+def _find_image_file(input_dir: str, ref: str, image_extensions: List[str]) -> Optional[str]:
+    """Resolve an image reference by probing the filesystem.
+    
+    Args:
+        input_dir: Source directory
+        ref: Image file path or reference relative to the source directory
+        image_extensions: Extensions to try when the reference has none
+    
+    Returns:
+        Path of the image file relative to the source directory, or None if not found
+    """
+    # Check if the referenced file exists in the input directory
+    if os.path.isfile(os.path.join(input_dir, ref)):
+        return ref
+    
+    # If the reference doesn't have a file extension, try adding common image extensions
+    if not os.path.splitext(ref)[1]:
+        for ext in image_extensions:
+            if os.path.isfile(os.path.join(input_dir, f"{ref}{ext}")):
+                return f"{ref}{ext}"
+    
+    return None
+
+
+def write_output_files(heading_contents: Dict[str, List[List[str]]], output_directory: Path) -> None:
     """Write accumulated content to output files by heading.
     
     Args:
-        heading_contents: Dictionary mapping headings to their content
+        heading_contents: Dictionary mapping headings to the chunks of content
+            collected for them (one list of lines per daily note)
         output_directory: Directory to write the output files
     """
     # Create output directory if it doesn't exist
     output_directory.mkdir(exist_ok=True, parents=True)
     
-    # Process each heading
-    for heading, content in heading_contents.items():
+    # Build the output paths as plain strings, avoiding a Path object
+    # for every file
+    output_dir = os.fspath(output_directory)
+    
+    # Group the headings by output file, so that headings which map to the
+    # same filename (e.g. "# a/b" and "# a_b") are written through one open
+    file_entries: DefaultDict[str, List[Tuple[str, List[List[str]]]]] = defaultdict(list)
+    for heading, chunks in heading_contents.items():
         # Skip empty content
-        if not content or all(line.strip() == "" for line in content):
+        if all(line.strip() == "" for chunk in chunks for line in chunk):
             continue
         
         # Create a safe filename from the heading
         # Remove the heading marks (# characters) and trim
         heading_text = heading.lstrip('#').strip()
         # Replace any characters that aren't safe for filenames
-        safe_filename = re.sub(r'[\\/*?:"<>|]', '_', heading_text) + '.md'
-        
+        safe_filename = heading_text.translate(_FILENAME_TRANS) + '.md'
+        file_entries[safe_filename].append((heading, chunks))
+    
+    # Process each output file
+    for safe_filename, entries in file_entries.items():
         # Create the output file path
-        output_file_path = output_directory / safe_filename
+        output_file_path = os.path.join(output_dir, safe_filename)
         
-        # Check if file already exists and append instead of overwriting
-        if output_file_path.exists():
-            # Read existing content
-            with open(output_file_path, 'r', encoding='utf-8') as infile:
-                existing_content = infile.read().rstrip()
-            
-            # Append the new content
-            with open(output_file_path, 'w', encoding='utf-8') as outfile:
-                # Check if existing content already has the heading
-                heading_line = heading + '\n'
-                if heading_line in existing_content:
-                    # If heading already exists, just append the content without the heading
-                    outfile.write(existing_content + '\n\n' + '\n'.join(content))
-                else:
-                    # If heading doesn't exist, append with the heading
-                    outfile.write(existing_content + '\n\n' + '\n'.join([heading] + [""] + content))
-            
-            print(f"Appended to existing file for heading '{heading_text}' at {output_file_path.name}")
+        # Create a new file if it doesn't exist. Exclusive creation fails
+        # for an existing file, so no separate exists() check is needed
+        try:
+            new_file = open(output_file_path, 'xb', buffering=_WRITE_BUFFER_SIZE)
+        except FileExistsError:
+            # Append instead of overwriting. In append mode every write lands
+            # at the end of the file (O_APPEND), so only the new content is
+            # ever written
+            with open(output_file_path, 'ab+', buffering=_WRITE_BUFFER_SIZE) as outfile:
+                # Read existing content
+                outfile.seek(0)
+                raw_content = outfile.read()
+                decoded_content = raw_content.decode('utf-8')
+                existing_content = decoded_content.rstrip()
+                
+                # Drop the trailing whitespace so the new content follows
+                # the existing content directly
+                trailing_size = len(decoded_content[len(existing_content):].encode('utf-8'))
+                outfile.truncate(len(raw_content) - trailing_size)
+                
+                _write_heading_entries(outfile, entries, existing_content, safe_filename)
         else:
-            # Create a new file if it doesn't exist
-            with open(output_file_path, 'w', encoding='utf-8') as outfile:
-                outfile.write('\n'.join([heading] + [""] + content))
-            
-            print(f"Created new file for heading '{heading_text}' at {output_file_path.name}")
\ No newline at end of file
+            with new_file as outfile:
+                _write_heading_entries(outfile, entries, None, safe_filename)
+
+
+def _write_heading_entries(outfile: BinaryIO, entries: List[Tuple[str, List[List[str]]]],
+                           existing_content: Optional[str], filename: str) -> None:
+    """Write the content of all headings that share one output file.
+    
+    Args:
+        outfile: Output file opened in binary mode, positioned at its end
+        entries: Pairs of (heading, chunks of content) in the order to write them
+        existing_content: Content already in the file without trailing whitespace,
+            or None if the file has just been created
+        filename: Name of the output file
+    """
+    for index, (heading, chunks) in enumerate(entries):
+        heading_text = heading.lstrip('#').strip()
+        content: Iterable[str] = itertools.chain.from_iterable(chunks)
+        if index < len(entries) - 1:
+            # Another heading is appended after this one, so drop the trailing
+            # whitespace the same way as for the content of an existing file
+            content = _rstrip_lines(list(content))
+        
+        if existing_content is None and index == 0:
+            # Start a new file with the heading
+            outfile.write(_encode_lines(itertools.chain([heading, ""], content)))
+            print(f"Created new file for heading '{heading_text}' at {filename}")
+            continue
+        
+        # Check if existing content already has the heading
+        # (files written in text mode on Windows use CRLF line endings)
+        if existing_content is not None and (
+                heading + '\n' in existing_content or heading + '\r\n' in existing_content):
+            # If heading already exists, just append the content without the heading
+            lines = itertools.chain(["", ""], content)
+        else:
+            # If heading doesn't exist, append with the heading
+            lines = itertools.chain(["", "", heading, ""], content)
+        outfile.write(_encode_lines(lines))
+        
+        print(f"Appended to existing file for heading '{heading_text}' at {filename}")
+
+
+def _rstrip_lines(lines: List[str]) -> List[str]:
+    """Remove trailing whitespace from a list of lines, like str.rstrip on the joined text.
+    
+    Args:
+        lines: Lines to strip, modified in place
+    
+    Returns:
+        The same list without trailing blank lines and trailing whitespace
+    """
+    while lines and lines[-1].strip() == "":
+        lines.pop()
+    if lines:
+        lines[-1] = lines[-1].rstrip()
+    return lines
+
+
+def _encode_lines(lines: Iterable[str]) -> bytes:
+    """Encode lines separated by the platform line separator.
+    
+    Produces the same bytes as writing '\\n'.join(lines) to a text mode file,
+    as one buffer so that it can be written with a single call.
+    
+    Args:
+        lines: Lines to encode
+    
+    Returns:
+        The UTF-8 encoded text
+    """
+    return os.linesep.join(lines).encode('utf-8')
@@ -10,8 +10,10 @@ from update_notes.processor import (
     find_image_references,
     process_file,
     write_output_files,
+    copy_image_files,
     process_markdown_files # これは統合テストで使うかも
 )
+from update_notes import processor
 
 # --- find_image_references のテスト ---
 
@@ -53,6 +55,21 @@ def test_find_image_references_no_images():
     expected = set()
     assert find_image_references(content) == expected
 
+def test_find_image_references_edge_cases():
+    """壊れた参照・外部URL・クエリ付きの参照を正しく扱えるか"""
+    content = """
+    ![alt](a.png) ![[b]] ![broken](no-close ![[c.gif]]
+    ![[wiki](md.png)] ![](http://example.com/x.png) ![e](d.jpg?x#y)
+    ![multi
+    line](multi.png) ![[]] ![]() 末尾 ![[e.svg]]"""
+    expected = {"a.png", "b", "c.gif", "md.png", "d.jpg", "multi.png", "e.svg"}
+    assert find_image_references(content) == expected
+
+def test_find_image_references_url_schemes():
+    """大文字やアプリ独自のスキームのURLも外部画像として除外されるか"""
+    content = "![](HTTPS://example.com/a.png) ![](obsidian://open?vault=x) ![](sftp://host/b.png) ![](data:image/png;base64,AAAA) ![](local.png)"
+    assert find_image_references(content) == {"local.png"}
+
 # --- process_file のテスト ---
 
 # テスト用のヘルパー関数: 一時ファイルを作成
@@ -126,6 +143,45 @@ def test_process_file_no_heading(create_temp_file):
     expected_content = [f"## {date_str}", "", "最初の見出しがない内容です。", ""]
     assert sections["# はじめに"] == expected_content
 
+def test_process_file_images_in_heading_and_body(create_temp_file):
+    """見出し行と本文の両方にある画像参照を見つけられるか"""
+    file_content = "# 見出し ![[heading.png]]\n本文 ![alt](body.jpg)\n## 次\n![[next]]"
+    file_path = create_temp_file("2024-01-03.md", file_content)
+
+    sections, image_refs = process_file(file_path, "2024-01-03")
+
+    assert image_refs == {"heading.png", "body.jpg", "next"}
+    assert list(sections.keys()) == ["# 見出し ![[heading.png]]", "## 次"] # 空の「はじめに」は返されない
+    assert sections["## 次"] == ["## 2024-01-03", "", "![[next]]", ""]
+
+def test_process_file_multiline_image_alt(create_temp_file):
+    """代替テキストが改行をまたぐ画像参照を見つけ、閉じていない「![」が見出しの分割に影響しないか"""
+    file_content = "# 見出し\n![複数行の\n代替テキスト](multi.png)\n![閉じていない\n# 次\n![[next.png]]\n"
+    file_path = create_temp_file("2024-01-05.md", file_content)
+
+    sections, image_refs = process_file(file_path, "2024-01-05")
+
+    assert image_refs == {"multi.png", "next.png"}
+    assert list(sections.keys()) == ["# 見出し", "# 次"]
+    assert sections["# 次"] == ["## 2024-01-05", "", "![[next.png]]", "", ""]
+
+def test_process_file_keeps_first_heading_order(create_temp_file):
+    """見出しは本文が現れた順ではなく、最初に現れた順に返されるか"""
+    file_path = create_temp_file("2024-01-06.md", "# A\n# B\nb\n# A\na\n")
+
+    sections, _ = process_file(file_path, "2024-01-06")
+
+    assert list(sections.keys()) == ["# A", "# B"]
+
+def test_process_file_crlf(tmp_path):
+    """CRLF改行のファイルもLF改行と同じように処理されるか"""
+    file_path = tmp_path / "2024-01-04.md"
+    file_path.write_bytes("# 見出し\r\n内容\r\n".encode('utf-8'))
+
+    sections, _ = process_file(file_path, "2024-01-04")
+
+    assert sections["# 見出し"] == ["## 2024-01-04", "", "内容", "", ""]
+
 # --- write_output_files のテスト ---
 
 @pytest.fixture
@@ -139,8 +195,8 @@ def test_write_output_files_new(setup_output_dir):
     """新しいファイルへの書き込み"""
     output_dir = setup_output_dir
     heading_contents = {
-        "# 見出し1": ["## 2024-01-01", "", "内容1"],
-        "## 見出し 2?*": ["## 2024-01-01", "", "内容2"] # ファイル名に使えない文字
+        "# 見出し1": [["## 2024-01-01", "", "内容1"]],
+        "## 見出し 2?*": [["## 2024-01-01", "", "内容2"]] # ファイル名に使えない文字
     }
 
     write_output_files(heading_contents, output_dir)
@@ -170,7 +226,7 @@ def test_write_output_files_append(setup_output_dir, create_temp_file):
     existing_file_path.write_text(existing_content, encoding='utf-8')
 
     heading_contents = {
-        "# 見出し1": ["## 2024-01-01", "", "新しい内容"]
+        "# 見出し1": [["## 2024-01-01", "", "新しい内容"]]
     }
 
     write_output_files(heading_contents, output_dir)
@@ -179,6 +235,73 @@ def test_write_output_files_append(setup_output_dir, create_temp_file):
     expected_content = existing_content + "\n\n## 2024-01-01\n\n新しい内容"
     assert existing_file_path.read_text(encoding='utf-8') == expected_content
 
+def test_write_output_files_append_trims_trailing_whitespace(setup_output_dir):
+    """既存ファイル末尾の空白を取り除いてから、見出し付きで追記するか"""
+    output_dir = setup_output_dir
+
+    existing_file_path = output_dir / "見出し1.md"
+    existing_file_path.write_text("## 2023-12-31\n\n古い内容\n\n\n", encoding='utf-8')
+
+    write_output_files({"# 見出し1": [["## 2024-01-01", "", "新しい内容", ""]]}, output_dir)
+
+    expected_content = "## 2023-12-31\n\n古い内容\n\n# 見出し1\n\n## 2024-01-01\n\n新しい内容\n"
+    assert existing_file_path.read_text(encoding='utf-8') == expected_content
+
+def test_write_output_files_same_filename(setup_output_dir):
+    """同じファイル名になる見出しを1つのファイルにまとめて書き込むか"""
+    output_dir = setup_output_dir
+    heading_contents = {
+        "# a/b": [["## 2024-01-01", "", "内容1", ""]],
+        "# a_b": [["## 2024-01-01", "", "内容2", ""]],
+    }
+
+    write_output_files(heading_contents, output_dir)
+
+    assert [p.name for p in output_dir.iterdir()] == ["a_b.md"]
+    expected_content = "# a/b\n\n## 2024-01-01\n\n内容1\n\n# a_b\n\n## 2024-01-01\n\n内容2\n"
+    assert (output_dir / "a_b.md").read_text(encoding='utf-8') == expected_content
+
+# --- copy_image_files のテスト ---
+
+def test_copy_image_files_resolves_references(tmp_path):
+    """直接参照・拡張子なし参照・サブディレクトリ参照の画像をコピーできるか"""
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    (input_dir / "assets").mkdir(parents=True)
+    (input_dir / "direct.gif").write_bytes(b"gif")
+    (input_dir / "photo.jpg").write_bytes(b"jpg")
+    (input_dir / "photo.png").write_bytes(b"png") # .png が .jpg より優先される
+    (input_dir / "assets" / "nested.svg").write_bytes(b"svg")
+    (input_dir / "assets" / "icon.webp").write_bytes(b"webp")
+
+    copy_image_files(input_dir, output_dir, {"direct.gif", "photo", "assets/nested.svg", "assets/icon", "missing"})
+
+    assert sorted(p.name for p in output_dir.iterdir()) == ["direct.gif", "icon.webp", "nested.svg", "photo.png"]
+    assert (output_dir / "photo.png").read_bytes() == b"png"
+
+def test_copy_image_files_probes_filesystem_on_index_miss(tmp_path, monkeypatch):
+    """インデックスに完全一致しない参照はファイルシステムで探すか（大文字小文字を区別しない環境の再現）"""
+    input_dir = tmp_path / "input"
+    output_dir = tmp_path / "output"
+    input_dir.mkdir()
+    (input_dir / "Photo.png").write_bytes(b"png")
+    (input_dir / "scan.PNG").write_bytes(b"scan")
+    (input_dir / "exact.gif").write_bytes(b"gif")
+
+    # Windows/macOS のファイルシステムが名前を解決した結果を返す
+    resolved = {"photo.png": "Photo.png", "scan": "scan.PNG"}
+    probed = []
+    def fake_find_image_file(input_dir, ref, image_extensions):
+        probed.append(ref)
+        return resolved.get(ref)
+    monkeypatch.setattr(processor, "_find_image_file", fake_find_image_file)
+
+    copy_image_files(input_dir, output_dir, {"photo.png", "scan", "exact.gif", "missing"})
+
+    # 完全一致した参照はインデックスだけで解決される
+    assert sorted(probed) == ["missing", "photo.png", "scan"]
+    assert sorted(p.name for p in output_dir.iterdir()) == ["Photo.png", "exact.gif", "scan.PNG"]
+
 # TODO: process_markdown_files の統合テストを追加する
 # - ファイルの検索、処理、移動、画像コピー、出力ファイル書き込みの一連の流れを確認
 # - Windows特有の処理（ファイル移動の代替、エンコーディング）も考慮できると尚良い
@@ -240,4 +363,38 @@ def test_process_markdown_files_skips_today(setup_integration_test_dirs, capsys)
     assert not (output_dir / "今日.md").exists() # 今日のファイルは出力されない
 
     # 元の入力ディレクトリに今日のファイルが残っているか確認
-    assert (input_dir / f"{today_str}.md").exists()
\ No newline at end of file
+    assert (input_dir / f"{today_str}.md").exists()
+
+def test_process_markdown_files_many_files_in_order(tmp_path, monkeypatch):
+    """ワーカープロセスで処理しても、日付順に内容がまとめられるか"""
+    # 少ないファイル数・CPUが1つの環境でもワーカープロセスを使わせる
+    monkeypatch.setattr(processor, "_MIN_FILES_FOR_WORKERS", 4)
+    monkeypatch.setattr(processor.os, "cpu_count", lambda: 2)
+    input_dir = tmp_path / "日々の記録"
+    output_dir = tmp_path / "まとめ"
+    input_dir.mkdir()
+
+    dates = [f"2024-01-{day:02d}" for day in range(1, 7)]
+    for date_str in reversed(dates):
+        (input_dir / f"{date_str}.md").write_text(f"# 日記\n{date_str}の内容\n", encoding='utf-8')
+
+    process_markdown_files(input_dir, output_dir)
+
+    content = (output_dir / "日記.md").read_text(encoding='utf-8')
+    positions = [content.index(f"## {date_str}") for date_str in dates]
+    assert positions == sorted(positions)
+    assert not any(input_dir.glob("*.md")) # すべて oldfiles に移動される
+
+def test_process_markdown_files_heading_level_collision(tmp_path):
+    """同じファイル名になる「# A」と「## A」が、それぞれの見出しの下に最初に現れた順で書かれるか"""
+    input_dir = tmp_path / "日々の記録"
+    output_dir = tmp_path / "まとめ"
+    input_dir.mkdir()
+    (input_dir / "2024-01-01.md").write_text("## A\n# A\nx\n", encoding='utf-8')
+    (input_dir / "2024-01-02.md").write_text("## A\ny\n", encoding='utf-8')
+
+    process_markdown_files(input_dir, output_dir)
+
+    # 1日目の「## A」は空なので、内容が最初に現れた「# A」が先になる
+    content = (output_dir / "A.md").read_text(encoding='utf-8')
+    assert content == "# A\n\n## 2024-01-01\n\nx\n\n## A\n\n## 2024-01-02\n\ny\n\n"
\ No newline at end of file